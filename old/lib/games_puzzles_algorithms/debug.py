@@ -4,8 +4,12 @@ import json
 import logging
 
 
+def is_enabled(level=logging.INFO):
+    return logging.getLogger().getEffectiveLevel() < level
+
+
 def log(data, level=logging.INFO, raw=False):
-    if logging.getLogger().getEffectiveLevel() >= level:
+    if not is_enabled(level):
         return
     sf = traceback.extract_stack()[-2]
     logger = logging.getLogger(sf[0])
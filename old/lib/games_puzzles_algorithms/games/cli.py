@@ -192,9 +192,22 @@ class Cli(Cmd, object):
     def _handle_no_move_action(self):
         next_player = self.game.state.player_to_act()
         self.game.state.set_player_to_act(self.game.opponent(next_player))
+        self.agent.reset()
 
         return (True, "")
 
+    def _set_player_to_act(self, player):
+        """Set the player to act, discarding the agent's search tree if that
+        changes whose turn it is."""
+        if player != self.game.state.player_to_act():
+            self.game.state.set_player_to_act(player)
+            self.agent.reset()
+
+    def _update_agent(self, action):
+        """Let the agent reuse its search below `action`, if it can."""
+        if hasattr(self.agent, 'update_root'):
+            self.agent.update_root(action)
+
     def do_play(self, arg_string, opts=None):
         """Play a stone of a given colour in a given cell.
 
@@ -223,7 +236,7 @@ class Cli(Cmd, object):
                 return (False, "Unrecognized player, \"{}\"".format(ui_player))
             else:
                 assert(player is not None)
-                self.game.state.set_player_to_act(player)
+                self._set_player_to_act(player)
 
         try:
             self.game.state.play(action)
@@ -232,6 +245,7 @@ class Cli(Cmd, object):
                     "Unable to take action, \"{}\", ({}): {}".format(ui_action,
                                                                      action,
                                                                      str(e)))
+        self._update_agent(action)
         return (True, ui_action)
 
     def _take_terminal_action(self, player):
@@ -256,7 +270,7 @@ class Cli(Cmd, object):
             except:
                 return (False, "Unrecognized player, \"{}\"".format(ui_player))
             else:
-                self.game.state.set_player_to_act(player)
+                self._set_player_to_act(player)
 
         if self.game.state.is_terminal():
             next_player = self.game.state.player_to_act()
@@ -268,6 +282,7 @@ class Cli(Cmd, object):
                 time_allowed_s=self.move_time
             )
             self.game.state.play(action)
+            self._update_agent(action)
         except Exception as e:
             return (True, "Unable to take action: " + str(e))
         else:
@@ -315,4 +330,5 @@ class Cli(Cmd, object):
 
     def do_undo(self, arg, opts=None):
         self.game.state.undo()
+        self.agent.reset()
         return (True, "")
@@ -1,4 +1,5 @@
 from array import array
+import random
 from heapdict import heapdict
 
 from .win_detector import WinDetector
@@ -27,6 +28,19 @@ class Board(object):
 
     EDGES = (-1, -2)
 
+    # Random bit strings for Zobrist hashing, one for each player on every
+    # cell, shared between boards with the same number of cells.
+    _zobrist_keys_by_num_cells = {}
+
+    @classmethod
+    def _shared_zobrist_keys(self, num_cells):
+        if num_cells not in self._zobrist_keys_by_num_cells:
+            generator = random.Random(num_cells)
+            self._zobrist_keys_by_num_cells[num_cells] = [
+                [generator.getrandbits(64) for _ in range(NUM_PLAYERS)]
+                for _ in range(num_cells)]
+        return self._zobrist_keys_by_num_cells[num_cells]
+
     def __init__(self, *dimensions):
         self._dimensions = list(dimensions)
         if len(self._dimensions) < 1:
@@ -34,6 +48,8 @@ class Board(object):
         if len(self._dimensions) < 2:
             self._dimensions.append(self._dimensions[0])
         self._cells = array('I', [COLOR_NONE] * len(self))
+        self._zobrist_keys = self._shared_zobrist_keys(len(self))
+        self._zobrist_hash = 0
 
         self._actions = [[] for _ in range(NUM_PLAYERS)]
         self._empty_cells = {}
@@ -46,6 +62,17 @@ class Board(object):
     def __len__(self):
         return prod(*self.size())
 
+    def __getstate__(self):
+        # The Zobrist keys are shared by all boards of this size, so they are
+        # looked up again rather than copied along with the board.
+        state = self.__dict__.copy()
+        del state['_zobrist_keys']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._zobrist_keys = self._shared_zobrist_keys(len(self))
+
     def is_empty(self, *cell):
         return self.cell_index(*cell) in self._empty_cells
 
@@ -98,6 +125,7 @@ class Board(object):
         '''Undo `player`'s last action.'''
         action = self._actions[player].pop()
         self._cells[action] = COLOR_NONE
+        self._zobrist_hash ^= self._zobrist_keys[action][player]
         self._empty_cells[action] = True
         del self._my_cells[player][action]
         return action
@@ -124,10 +152,17 @@ class Board(object):
             self._cells[action] = color
             self._my_cells[player][action] = True
             self._actions[player].append(action)
+            self._zobrist_hash ^= self._zobrist_keys[action][player]
 
         del self._empty_cells[action]
         return color
 
+    def zobrist_hash(self):
+        '''Return a hash of the stones on the board that is updated
+        incrementally as actions are played and undone.
+        '''
+        return self._zobrist_hash
+
     def num_legal_actions(self):
         return len(self._empty_cells)
 
@@ -474,6 +509,13 @@ class GameState(object):
     def player_to_act(self):
         return self._acting_player
 
+    def transposition_key(self):
+        '''Return a key that is equal for states with the same stones on
+        the board and the same player to act, regardless of the order in
+        which the stones were placed.
+        '''
+        return (self.board.zobrist_hash(), self._acting_player)
+
     def set_player_to_act(self, player):
         self._acting_player = player
 
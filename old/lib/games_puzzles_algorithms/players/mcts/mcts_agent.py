@@ -1,4 +1,6 @@
 from __future__ import division
+import multiprocessing
+import random
 import time
 from math import sqrt, log
 from games_puzzles_algorithms.choose import choose_legal_action_randomly
@@ -7,6 +9,24 @@ import logging
 import json
 INF = float('inf')
 
+# Exploration terms of the UCB formula indexed by visit count, grown on
+# demand by `_extend_exploration_tables` up to `_MAX_EXPLORATION_TABLE_SIZE`
+# entries (a few megabytes). Terms for larger visit counts are computed
+# directly.
+_MAX_EXPLORATION_TABLE_SIZE = 1 << 16
+_SQRT_2_LOG = [0.0]
+_INV_SQRT = [INF]
+
+
+def _extend_exploration_tables(num_visits):
+    # Grow geometrically since the root's visit count, and hence the
+    # largest index needed, increases on every iteration of search.
+    for n in range(len(_INV_SQRT),
+                   min(max(num_visits + 1, 2 * len(_INV_SQRT)),
+                       _MAX_EXPLORATION_TABLE_SIZE)):
+        _SQRT_2_LOG.append(sqrt(2 * log(n)))
+        _INV_SQRT.append(1 / sqrt(n))
+
 
 class TimeIsUp(Exception):
     pass
@@ -14,6 +34,9 @@ class TimeIsUp(Exception):
 
 class BanditNode(object):
 
+    __slots__ = ('action', 'parent', 'num_visits', '_avg_reward',
+                 '_children', '_num_descendents', 'acting_player')
+
     @staticmethod
     def greedy_value(node): return node.avg_reward()
 
@@ -23,17 +46,42 @@ class BanditNode(object):
 
         The parameter `exploration` specifies how much the value should favor
         nodes that have yet to be thoroughly explored versus nodes that
-        seem to have a high win rate.
+        seem to have a high win rate. Unvisited nodes are always given an
+        infinite value so that every child is tried once before any is
+        revisited.
         """
         if node.num_visits > 0:
             return (node.avg_reward()
                     + exploration
                     * sqrt(2 * log(node.parent.num_visits) / node.num_visits))
         else:
-            if exploration > 0:
-                return INF
-            else:
-                return node.avg_reward()
+            return INF
+
+    @staticmethod
+    def ucb_values(nodes, exploration):
+        """Return the upper confidence bounds of the given sibling nodes.
+
+        Equivalent to `[ucb_value(n, exploration) for n in nodes]` up to
+        rounding, but computed in a single pass that reads the node
+        statistics directly and looks the exploration terms up in tables
+        indexed by visit count rather than computing a logarithm and a
+        square root for every node.
+        """
+        if len(nodes) < 1:
+            return []
+        parent_visits = nodes[0].parent.num_visits
+        if parent_visits >= _MAX_EXPLORATION_TABLE_SIZE:
+            c = exploration * sqrt(2 * log(parent_visits))
+            return [(n._avg_reward + c / sqrt(n.num_visits))
+                    if n.num_visits > 0 else INF
+                    for n in nodes]
+        if parent_visits >= len(_INV_SQRT):
+            _extend_exploration_tables(parent_visits)
+        c = exploration * _SQRT_2_LOG[parent_visits]
+        inv_sqrt = _INV_SQRT
+        return [(n._avg_reward + c * inv_sqrt[n.num_visits])
+                if n.num_visits > 0 else INF
+                for n in nodes]
 
     @staticmethod
     def lcb_value(node, reluctance):
@@ -64,6 +112,7 @@ class BanditNode(object):
         # who acted to reach this node.
         self._avg_reward = 0
         self._children = []
+        self._num_descendents = 0
         # The player who acted to reach this node
         self.acting_player = acting_player
 
@@ -81,43 +130,75 @@ class BanditNode(object):
                           acting_player=state.player_to_act())
 
     def expand(self, game_state):
-        if game_state.num_legal_actions() > 0:
-            assert(not game_state.is_terminal())
-
-            for action in game_state.legal_actions():
-                self._children.append(self.create_child(game_state, action))
+        if not game_state.is_terminal():
+            create_child = self.create_child
+            new_children = [create_child(game_state, action)
+                            for action in game_state.legal_actions()]
+            self._children += new_children
+            self._add_descendents(len(new_children))
+
+    def _add_descendents(self, num_new_nodes):
+        """Account for `num_new_nodes` new nodes below this one in the
+        descendent counts on the path from this node to root.
+        """
+        node = self
+        while True:
+            node._num_descendents += num_new_nodes
+            if node.is_root():
+                break
+            node = node.parent
 
-    def backup(self, score=0):
+    def backup(self, score=0, num_visits=1):
         """Update the node statistics on the path from the passed node to
         root to reflect the value of the given `simulation_statistics`.
-        """
-        self.num_visits += 1
-        self._avg_reward += (score - self._avg_reward) / self.num_visits
 
-        debug.log(lambda:
-            {
-                'num_visits': self.num_visits,
-                'score': score,
-                'avg_reward': self._avg_reward,
-                'is_root': self.is_root()
-            },
-            level=logging.INFO)
-
-        if not self.is_root():
-            if (not self.parent.is_decision_node()
-                    and self.acting_player != self.parent.acting_player):
+        `score` is the total score of `num_visits` simulations.
+        """
+        verbose = debug.is_enabled(logging.INFO)
+        node = self
+        while True:
+            node.num_visits += num_visits
+            node._avg_reward += ((score - num_visits * node._avg_reward)
+                                 / node.num_visits)
+
+            if verbose:
+                debug.log(lambda:
+                    {
+                        'num_visits': node.num_visits,
+                        'score': score,
+                        'avg_reward': node._avg_reward,
+                        'is_root': node.is_root()
+                    },
+                    level=logging.INFO)
+
+            if node.is_root():
+                break
+            parent = node.parent
+            if (not parent.is_decision_node()
+                    and node.acting_player != parent.acting_player):
                 score = -score
 
-            debug.log(lambda:
-                {
-                    'parent.is_decision_node': self.parent.is_decision_node(),
-                    'parent.acting_player': self.parent.acting_player,
-                    'acting_player': self.acting_player,
-                    'parent.score': score
-                },
-                level=logging.INFO)
-
-            self.parent.backup(score=score)
+            if verbose:
+                debug.log(lambda:
+                    {
+                        'parent.is_decision_node': parent.is_decision_node(),
+                        'parent.acting_player': parent.acting_player,
+                        'acting_player': node.acting_player,
+                        'parent.score': score
+                    },
+                    level=logging.INFO)
+
+            node = parent
+
+    def backup_roll_outs(self, roll_out_results):
+        """Update the statistics on the path from this node to root with the
+        results of every roll-out executed from this node in a single pass.
+        """
+        if len(roll_out_results) == 1:
+            self.backup(**roll_out_results[0])
+        else:
+            self.backup(score=sum(r['score'] for r in roll_out_results),
+                        num_visits=len(roll_out_results))
 
     def child_nodes(self): return self._children
 
@@ -131,19 +212,31 @@ class BanditNode(object):
         '''Returns the list of children with the best value from this
            node's perspective, according to the given value function.
 
+        If no value function is given, this node's default value function is
+        used.
+        '''
+        favorites = []
+        best_value = -INF
+        for node, node_value in zip(self.child_nodes(),
+                                    self.child_values(value)):
+            if node_value > best_value:
+                best_value = node_value
+                favorites = [node]
+            elif node_value == best_value:
+                favorites.append(node)
+        return favorites
+
+    def child_values(self, value=None):
+        '''Returns the value of each child, in the order of `child_nodes`.
+
         If no value function is given, this node's default value function is
         used.
         '''
         if value is None:
             value = type(self).value
-        best_value = value(max(self.child_nodes(), key=value))
-        return [n for n in self.child_nodes() if value(n) == best_value]
+        return [value(n) for n in self.child_nodes()]
 
-    def num_descendents(self):
-        count = 0
-        for child in self.child_nodes():
-            count += child.num_descendents() + 1
-        return count
+    def num_descendents(self): return self._num_descendents
 
     def num_nodes(self): return self.num_descendents() + 1
 
@@ -190,6 +283,8 @@ class BanditNode(object):
 
 class UctNode(BanditNode):
 
+    __slots__ = ('exploration',)
+
     def __init__(self, exploration, *args, **kwargs):
         super(UctNode, self).__init__(*args, **kwargs)
         self.exploration = exploration
@@ -204,6 +299,11 @@ class UctNode(BanditNode):
 
     def value(self): return BanditNode.ucb_value(self, self.exploration)
 
+    def child_values(self, value=None):
+        if value is None:
+            return BanditNode.ucb_values(self.child_nodes(), self.exploration)
+        return super(UctNode, self).child_values(value)
+
     def info_string(self):
         return (super(UctNode, self).info_string()
                 + (' ucb_value: {}'.format(self.value())))
@@ -214,8 +314,31 @@ class UctNode(BanditNode):
         return d
 
 
+def _root_visits_from_independent_search(agent_class,
+                                         root,
+                                         agent_options,
+                                         seed,
+                                         game_state,
+                                         time_allowed_s,
+                                         num_iterations):
+    """Search `game_state` with a fresh agent seeded with `seed` and return
+    the number of visits of each action at the root.
+
+    Used by `MctsAgent.select_action` to run searches in worker processes.
+    """
+    agent = agent_class(random.Random(seed), root, **agent_options)
+    agent.search(game_state,
+                 time_allowed_s=time_allowed_s,
+                 num_iterations=num_iterations)
+    return {n.action: n.num_visits for n in agent._root.child_nodes()}
+
+
 class MctsAgent(object):
 
+    # The clock is only read on every `time_check_interval`th check of
+    # whether there is time left for search.
+    time_check_interval = 64
+
     @staticmethod
     def final_selection_rule(node): return node.num_visits
 
@@ -223,12 +346,40 @@ class MctsAgent(object):
     def with_same_parameters(self, other):
         return self(root=other._root.clone())
 
-    def __init__(self, random_generator, root=None):
+    def __init__(self,
+                 random_generator,
+                 root=None,
+                 num_workers=1,
+                 num_roll_outs_per_leaf=1):
         self._random = random_generator
         self._root = UctNode(1) if root is None else root
+        self._num_workers = num_workers
+        self._num_roll_outs_per_leaf = num_roll_outs_per_leaf
         self.reset()
 
-    def reset(self): self._root.reset()
+    def reset(self):
+        self._root.reset()
+        self._transpositions = {}
+        self._reuse_root = False
+
+    def update_root(self, action):
+        """Advance the search tree past `action` so that the statistics
+        gathered below it are reused by the next call to `select_action`.
+
+        Should be called with each action taken in the game, by any player,
+        after `select_action`. If `action` was never explored, the tree is
+        discarded and the next search starts from scratch.
+        """
+        for child in self._root.child_nodes():
+            if child.action == action:
+                # Detach the subtree so the rest of the old tree can be
+                # garbage collected.
+                child.parent = child
+                self._root = child
+                self._transpositions = {}
+                self._reuse_root = True
+                return
+        self.reset()
 
     def select_action(self,
                       game_state,
@@ -250,8 +401,30 @@ class MctsAgent(object):
         uniformly at random.
 
         `time_allowed_s` and `num_iterations` cannot both be negative.
+
+        The search starts from a new tree unless `update_root` has been
+        called since the last search, this agent uses a single worker, and
+        some search is allowed. A zero budget always starts from a new
+        tree so that the action is still selected uniformly at random.
+
+        If this agent was created with more than one worker, each worker
+        process searches an independent tree from `game_state`, which must
+        therefore be picklable, and the action visited most often across
+        all of their roots is returned. Each worker is given the full
+        `time_allowed_s` and an equal share of `num_iterations`.
         """
-        self.reset()
+        # Workers always build their own trees, so a reused root would
+        # only be pickled to them to be thrown away.
+        if (not self._reuse_root
+                or self._num_workers > 1
+                or time_allowed_s == 0
+                or num_iterations == 0):
+            self.reset()
+        self._reuse_root = False
+        if self._num_workers > 1:
+            return self._select_action_in_parallel(game_state,
+                                                   time_allowed_s,
+                                                   num_iterations)
         self.search(game_state,
                     time_allowed_s=time_allowed_s,
                     num_iterations=num_iterations)
@@ -259,6 +432,41 @@ class MctsAgent(object):
             self._root.favorite_children(
                 type(self).final_selection_rule)).action
 
+    def _select_action_in_parallel(self,
+                                   game_state,
+                                   time_allowed_s,
+                                   num_iterations):
+        num_workers = self._num_workers
+        if num_iterations > 0:
+            num_workers = min(num_workers, num_iterations)
+            worker_iterations = [
+                num_iterations // num_workers
+                + (1 if i < num_iterations % num_workers else 0)
+                for i in range(num_workers)]
+        else:
+            worker_iterations = [num_iterations] * num_workers
+
+        agent_options = {
+            'num_roll_outs_per_leaf': self._num_roll_outs_per_leaf}
+        jobs = [(type(self),
+                 self._root,
+                 agent_options,
+                 self._random.random(),
+                 game_state,
+                 time_allowed_s,
+                 iterations) for iterations in worker_iterations]
+        with multiprocessing.Pool(num_workers) as pool:
+            worker_visits = pool.starmap(
+                _root_visits_from_independent_search, jobs)
+
+        visits = {}
+        for root_visits in worker_visits:
+            for action, num_visits in root_visits.items():
+                visits[action] = visits.get(action, 0) + num_visits
+        most_visits = max(visits.values())
+        return self._random.choice(
+            [a for a, v in visits.items() if v == most_visits])
+
     def search(self, root_state, time_allowed_s=-1, num_iterations=-1):
         """Execute MCTS from `root_state`.
 
@@ -281,9 +489,12 @@ class MctsAgent(object):
         if root_state.is_terminal():
             return None
 
-        start_time = time.clock()
+        # Integer nanoseconds keep the deadline check to an int comparison.
+        start_time_ns = time.perf_counter_ns()
+        deadline_ns = start_time_ns + int(time_allowed_s * 1e9)
 
-        self._root.expand(root_state)
+        if self._root.is_leaf():
+            self._root.expand(root_state)
 
         debug.log(lambda:
             {
@@ -294,13 +505,24 @@ class MctsAgent(object):
             level=logging.INFO)
         debug.log(lambda: str(root_state), level=logging.INFO, raw=True)
 
+        # Settings that cannot change during search are looked up once here
+        # rather than on every iteration.
+        verbose = debug.is_enabled(logging.INFO)
+        track_transpositions = hasattr(root_state, 'transposition_key')
+
         num_iterations_completed = 0
-        time_used_s = 0
+        time_check_interval = type(self).time_check_interval
+        num_time_checks = 0
+        time_is_up = False
 
         def time_is_available():
-            nonlocal time_used_s
-            time_used_s = time.clock() - start_time
-            return (time_allowed_s < 0 or time_used_s < time_allowed_s)
+            nonlocal num_time_checks, time_is_up
+            if time_allowed_s < 0:
+                return True
+            if num_time_checks % time_check_interval == 0:
+                time_is_up = time.perf_counter_ns() >= deadline_ns
+            num_time_checks += 1
+            return not time_is_up
 
         while (num_iterations < 1
                or num_iterations_completed < num_iterations):
@@ -312,27 +534,40 @@ class MctsAgent(object):
             except TimeIsUp:
                 break
 
-            debug.log(lambda:"Executing roll-out from (player {} is acting):"
-                      .format(game_state.player_to_act()),
-                      level=logging.INFO)
-            debug.log(lambda:str(game_state), level=logging.INFO, raw=True)
-
-            rollout_results = self.roll_out(game_state, node.acting_player)
-            debug.log(lambda:{'Roll-out results': rollout_results})
-            node.backup(**rollout_results)
-
-            debug.log(lambda:
-                {
-                    'Updated search tree': self._root.info_strings_to_dict(),
-                    'Seconds used': time_used_s,
-                    '# iterations completed': num_iterations_completed + 1
-                },
-                level=logging.INFO)
-
-            for _ in range(num_actions):
-                game_state.undo()
+            if verbose:
+                debug.log(lambda:
+                          "Executing roll-out from (player {} is acting):"
+                          .format(game_state.player_to_act()),
+                          level=logging.INFO)
+                debug.log(lambda:str(game_state), level=logging.INFO, raw=True)
+
+            transposition = (self._transposition(node, game_state)
+                             if track_transpositions else None)
+            if transposition is None:
+                rollout_results = [
+                    self.roll_out(game_state, node.acting_player)
+                    for _ in range(self._num_roll_outs_per_leaf)]
+            else:
+                rollout_results = [{'score': transposition.avg_reward()}]
+            if verbose:
+                debug.log(lambda:{'Roll-out results': rollout_results})
+            node.backup_roll_outs(rollout_results)
+
+            if verbose:
+                debug.log(lambda:
+                    {
+                        'Updated search tree':
+                            self._root.info_strings_to_dict(),
+                        'Seconds used':
+                            (time.perf_counter_ns() - start_time_ns) / 1e9,
+                        '# iterations completed': num_iterations_completed + 1
+                    },
+                    level=logging.INFO)
+
+            self._unwind(game_state, num_actions)
             num_iterations_completed += 1
 
+        time_used_s = (time.perf_counter_ns() - start_time_ns) / 1e9
         return {'num_iterations_completed': num_iterations_completed,
                 'time_used_s': time_used_s,
                 'num_nodes_expanded': self._root.num_nodes()}
@@ -340,14 +575,18 @@ class MctsAgent(object):
     def select_node(self, node, game_state, time_is_available=lambda: True):
         assert(not game_state.is_terminal())
 
+        choose = self._random.choice
+        play = game_state.play
+
         num_actions = 0
         my_child_nodes = node.child_nodes()
         while len(my_child_nodes) > 0:
             if not time_is_available():
+                self._unwind(game_state, num_actions)
                 raise TimeIsUp()
 
-            node = self._random.choice(node.favorite_children())
-            game_state.play(node.action)
+            node = choose(node.favorite_children())
+            play(node.action)
             num_actions += 1
 
             # If some child node has not been explored select it
@@ -363,11 +602,33 @@ class MctsAgent(object):
         my_child_nodes = node.child_nodes()
         if len(my_child_nodes) > 0:
             assert(not game_state.is_terminal())
-            node = self._random.choice(node.child_nodes())
-            game_state.play(node.action)
+            node = choose(my_child_nodes)
+            play(node.action)
             num_actions += 1
         return (node, game_state, num_actions)
 
+    def _transposition(self, node, game_state):
+        """Return a node elsewhere in the tree that represents the same
+        position as `node` and whose statistics can stand in for a roll-out
+        from the unexplored `node`, or `None` if there is no such node.
+
+        `game_state` must provide a `transposition_key` method.
+        """
+        other = self._transpositions.setdefault(
+            game_state.transposition_key(), node)
+        if (other is node
+                or not node.is_unexplored()
+                or other.is_unexplored()
+                or other.acting_player != node.acting_player):
+            return None
+        return other
+
+    @staticmethod
+    def _unwind(state, num_actions):
+        '''Undo the last `num_actions` actions played in `state`.'''
+        for _ in range(num_actions):
+            state.undo()
+
     def roll_out_policy(self, state):
         '''Random roll-out policy.'''
         return choose_legal_action_randomly(state, self._random.random())
@@ -382,13 +643,14 @@ class MctsAgent(object):
         Return roll out statistics from the perspective of
         `player_of_interest`.
         """
-        if state.is_terminal():
+        num_actions = 0
+        try:
+            while not state.is_terminal():
+                state.play(self.roll_out_policy(state))
+                num_actions += 1
             return self.evaluation(state, player_of_interest)
-        else:
-            action = self.roll_out_policy(state)
-            with state.play(action):
-                outcome = self.roll_out(state, player_of_interest)
-            return outcome
+        finally:
+            self._unwind(state, num_actions)
 
     def num_nodes_in_tree(self): return self._root.num_nodes()
 
@@ -1,4 +1,5 @@
-from games_puzzles_algorithms.players.mcts.mcts_agent import UctNode, MctsAgent
+from games_puzzles_algorithms.players.mcts.mcts_agent \
+    import BanditNode, UctNode, MctsAgent
 from math import sqrt, log
 from copy import deepcopy
 INF = float('inf')
@@ -6,8 +7,17 @@ INF = float('inf')
 
 class RaveNode(UctNode):
 
+    __slots__ = ('rave_num_visits', '_rave_avg_bonus', 'rave_limit')
+
     @staticmethod
     def enable_rave(state):
+        if hasattr(state, 'rave_moves'):
+            # Actions taken before the current position are not part of
+            # any simulation, so tracking restarts from here rather than
+            # wrapping `play` and `undo` again.
+            state.rave_moves().clear()
+            return
+
         rave_moves = {}
         state.play_without_tracking_rave_moves = state.play
 
@@ -26,13 +36,28 @@ class RaveNode(UctNode):
             nonlocal rave_moves, state
             player = state.player_who_acted_last()
             action = state.last_action()
-            if action in rave_moves[player]:
+            if player in rave_moves and action in rave_moves[player]:
                 del rave_moves[player][action]
             return state.undo_without_tracking_rave_moves()
         state.undo = undo_while_tracking_rave
 
         state.rave_moves = lambda: rave_moves
 
+    @staticmethod
+    def without_rave(state):
+        """Return a copy of `state` without the wrappers installed by
+        `enable_rave`, or `state` itself if it has none."""
+        if not hasattr(state, 'rave_moves'):
+            return state
+        state = deepcopy(state)
+        for attribute in ['play',
+                          'undo',
+                          'rave_moves',
+                          'play_without_tracking_rave_moves',
+                          'undo_without_tracking_rave_moves']:
+            delattr(state, attribute)
+        return state
+
     def __init__(self,
                  exploration,
                  limit,
@@ -63,10 +88,7 @@ class RaveNode(UctNode):
                     + self.exploration
                     * sqrt(2 * log(self.parent.num_visits) / self.num_visits))
         else:
-            if self.exploration > 0:
-                return INF
-            else:
-                return self.avg_reward()
+            return INF
 
     def lcb(self):
         """Return the lower confidence bound of this node."""
@@ -86,6 +108,9 @@ class RaveNode(UctNode):
 
     def value(self): return self.ucb()
 
+    def child_values(self, value=None):
+        return BanditNode.child_values(self, value)
+
     def create_child(self, state, action):
         return type(self)(self.exploration,
                           self.rave_limit,
@@ -97,25 +122,33 @@ class RaveNode(UctNode):
         """Update the node statistics on the path from the passed node to
         root to reflect the value of the given `simulation_statistics`.
         """
-        self.num_visits += 1
-        self._avg_reward += (score - self._avg_reward) / self.num_visits
-
-        if rave_moves and self.acting_player in rave_moves:
-            for child in self._children:
-                if child.action in rave_moves[self.acting_player]:
-                    child.rave_num_visits += 1
-                    child_score = score
-                    if (not self.is_decision_node()
-                            and child.acting_player != self.acting_player):
-                        child_score = -score
-                    child._rave_avg_bonus += ((child_score
-                                               - child._rave_avg_bonus)
-                                              / child.rave_num_visits)
-        if not self.is_root():
-            if (not self.parent.is_decision_node()
-                    and self.acting_player != self.parent.acting_player):
+        node = self
+        while True:
+            node.num_visits += 1
+            node._avg_reward += (score - node._avg_reward) / node.num_visits
+
+            if rave_moves and node.acting_player in rave_moves:
+                for child in node._children:
+                    if child.action in rave_moves[node.acting_player]:
+                        child.rave_num_visits += 1
+                        child_score = score
+                        if (not node.is_decision_node()
+                                and child.acting_player != node.acting_player):
+                            child_score = -score
+                        child._rave_avg_bonus += ((child_score
+                                                   - child._rave_avg_bonus)
+                                                  / child.rave_num_visits)
+            if node.is_root():
+                break
+            if (not node.parent.is_decision_node()
+                    and node.acting_player != node.parent.acting_player):
                 score = -score
-            self.parent.backup(score=score, rave_moves=rave_moves)
+            node = node.parent
+
+    def backup_roll_outs(self, roll_out_results):
+        # RAVE statistics depend on the moves of each individual roll-out.
+        for results in roll_out_results:
+            self.backup(**results)
 
     def info_string(self):
         return (super(RaveNode, self).info_string()
@@ -135,17 +168,24 @@ class RaveNode(UctNode):
 class RaveAgent(MctsAgent):
     """A Monte Carle Tree Search Agent with Rapid Action Value Estimation."""
 
-    def __init__(self, random_generator, node=None):
+    def __init__(self, random_generator, node=None, **kwargs):
         if node is None:
             node = RaveNode(1, 300)
-        super(RaveAgent, self).__init__(random_generator, node)
+        super(RaveAgent, self).__init__(random_generator, node, **kwargs)
 
     def search(self, root_state, *args, **kwargs):
         RaveNode.enable_rave(root_state)
         return super(RaveAgent, self).search(root_state, *args, **kwargs)
 
+    def _select_action_in_parallel(self, game_state, *args):
+        # The wrappers installed by `enable_rave` are closures, which cannot
+        # be pickled, so workers get a copy of the state without them.
+        return super(RaveAgent, self)._select_action_in_parallel(
+            RaveNode.without_rave(game_state), *args)
+
     def evaluation(self, state, player_of_interest):
-        rave_moves = deepcopy(state.rave_moves()) \
+        rave_moves = {player: dict(actions)
+                      for player, actions in state.rave_moves().items()} \
             if hasattr(state, 'rave_moves') else None
         return {'score': state.score(player_of_interest),
                 'rave_moves': rave_moves}
@@ -44,7 +44,7 @@ class AlphaBetaAgent(MinimaxAgent):
             raise self.TimeIsUp
         else:
             tree['children'] = []
-            start_time = time.clock() if time_allowed_s > 0 else 0
+            start_time = time.perf_counter() if time_allowed_s > 0 else 0
             actions_considered = 0
             num_actions = game_state.num_legal_actions()
             for action in game_state.legal_actions():
@@ -56,7 +56,7 @@ class AlphaBetaAgent(MinimaxAgent):
                         -beta,
                         -alpha,
                         time_allowed_s,
-                        (time_used + time.clock() - start_time),
+                        (time_used + time.perf_counter() - start_time),
                         max_depth - 1,
                         tree['children'][-1])
                     if action_value > tree['value']:
@@ -81,7 +81,7 @@ class AlphaBetaAgent(MinimaxAgent):
         rootnode before applying a heuristic.
         """
         self.pruned_nodes = 0
-        start_time = time.clock() if time_allowed_s > 0 else 0
+        start_time = time.perf_counter() if time_allowed_s > 0 else 0
         best_action = None
         action_value = -INF
 
@@ -100,7 +100,7 @@ class AlphaBetaAgent(MinimaxAgent):
                         -INF,
                         INF,
                         time_allowed_s,
-                        time.clock() - start_time,
+                        time.perf_counter() - start_time,
                         max_depth - 1,
                         self._tree['children'][-1])
                 except self.TimeIsUp:
@@ -113,7 +113,8 @@ class AlphaBetaAgent(MinimaxAgent):
                                level=logging.INFO)
                     break
                 else:
-                    log_time = time_allowed_s - (time.clock() - start_time)
+                    log_time = (time_allowed_s
+                                - (time.perf_counter() - start_time))
                     debug.log(lambda:{'Time remaining in seconds': log_time,
                                'Best action so far:': best_action,
                                'New value': action_value,
@@ -129,7 +130,7 @@ class AlphaBetaAgent(MinimaxAgent):
                                    'Value': self._tree['value']},
                                    level=logging.INFO)
 
-        log_time = time_allowed_s - (time.clock() - start_time)
+        log_time = time_allowed_s - (time.perf_counter() - start_time)
         debug.log(lambda:{'Time remaining in seconds': log_time,
                    'Best action so far:': best_action,
                    'Value': self._tree['value'],
@@ -35,14 +35,14 @@ class MinimaxAgent(object):
             raise self.TimeIsUp
         else:
             tree['children'] = []
-            start_time = time.clock() if time_allowed_s > 0 else 0
+            start_time = time.perf_counter() if time_allowed_s > 0 else 0
             for action in game_state.legal_actions():
                 tree['children'].append({'action': action})
                 with game_state.play(action):
                     action_value = -self.value(
                         game_state,
                         time_allowed_s=time_allowed_s,
-                        time_used=time.clock() - start_time + time_used,
+                        time_used=time.perf_counter() - start_time + time_used,
                         tree=tree['children'][-1])
                     if action_value > tree['value']:
                         tree['value'] = action_value
@@ -63,7 +63,7 @@ class MinimaxAgent(object):
 
         A non-positive `time_allowed_s` implies no time limit.
         '''
-        start_time = time.clock() if time_allowed_s > 0 else 0
+        start_time = time.perf_counter() if time_allowed_s > 0 else 0
         best_action = None
         action_value = -INF
 
@@ -80,7 +80,7 @@ class MinimaxAgent(object):
                     action_value = -self.value(
                         game_state,
                         time_allowed_s=time_allowed_s,
-                        time_used=time.clock() - start_time,
+                        time_used=time.perf_counter() - start_time,
                         tree=self._tree['children'][-1])
                 except self.TimeIsUp:
                     if best_action is None:
@@ -94,7 +94,7 @@ class MinimaxAgent(object):
                 else:
                     debug.log(lambda:{'Time remaining in seconds': (
                         time_allowed_s
-                        - (time.clock() - start_time)),
+                        - (time.perf_counter() - start_time)),
                         'Best action so far:': best_action,
                         'New value': action_value,
                         'Value': self._tree['value'],
@@ -106,19 +106,19 @@ class MinimaxAgent(object):
 
                         debug.log(lambda:{'Time remaining in seconds': (
                             time_allowed_s
-                            - (time.clock() - start_time)),
+                            - (time.perf_counter() - start_time)),
                             'Best action so far:': best_action,
                             'Value': self._tree['value']},
                             level=logging.INFO)
         debug.log(lambda:{'Time remaining in seconds': (
             time_allowed_s
-            - (time.clock() - start_time)),
+            - (time.perf_counter() - start_time)),
             'Best action so far:': best_action,
             'Value': self._tree['value'],
             'Tree': self.to_dict()}, level=logging.INFO)
         debug.log_t(lambda:{'Time remaining in seconds': (
             time_allowed_s
-            - (time.clock() - start_time)),
+            - (time.perf_counter() - start_time)),
             'Best action so far:': best_action,
             'Value': self._tree['value']}, level=logging.INFO)
         return best_action
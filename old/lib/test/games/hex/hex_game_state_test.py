@@ -1,5 +1,7 @@
 import pytest
 import random
+import pickle
+from copy import deepcopy
 from games_puzzles_algorithms.games.hex.game_state import color_to_player
 from games_puzzles_algorithms.games.hex.game_state import COLOR_NONE, COLOR_BLACK, COLOR_WHITE
 from games_puzzles_algorithms.games.hex.game_state import GameState
@@ -452,3 +454,41 @@ def test_heuristic_with_played_cell():
     patient = GameState.root(5)
     patient.play(patient.board.cell_index(2, 0))
     assert patient.heuristic(1) == 1 / 5
+
+
+def test_transposition_key():
+    patient = GameState.root(3)
+    root_key = patient.transposition_key()
+
+    patient.play(0)
+    patient.play(1)
+    patient.play(2)
+    key = patient.transposition_key()
+    for _ in range(3):
+        patient.undo()
+    assert patient.transposition_key() == root_key
+
+    patient.play(2)
+    patient.play(1)
+    patient.play(0)
+    assert patient.transposition_key() == key
+
+    patient.undo()
+    patient.undo()
+    patient.play(0)
+    patient.play(1)
+    assert patient.transposition_key() != key
+
+
+def test_copy_shares_zobrist_keys():
+    patient = GameState.root(3)
+    patient.play(0)
+    patient.play(4)
+
+    for copy in [deepcopy(patient), pickle.loads(pickle.dumps(patient))]:
+        assert copy.board._zobrist_keys is patient.board._zobrist_keys
+        assert copy.board.zobrist_hash() == patient.board.zobrist_hash()
+        copy.undo()
+        patient.undo()
+        assert copy.board.zobrist_hash() == patient.board.zobrist_hash()
+        patient.play(4)
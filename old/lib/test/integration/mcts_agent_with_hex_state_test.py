@@ -10,3 +10,20 @@ def test_select_action():
     action = patient.select_action(state, num_iterations=10)
     state.play(action)
     assert patient.select_action(state, num_iterations=10) != action
+
+
+def test_search_shares_statistics_between_transpositions():
+    class RollOutCountingAgent(MctsAgent):
+        num_roll_outs = 0
+
+        def roll_out(self, *args, **kwargs):
+            self.num_roll_outs += 1
+            return super(RollOutCountingAgent, self).roll_out(*args, **kwargs)
+
+    random.seed(0)
+    state = GameState.root(3)
+    patient = RollOutCountingAgent(random, UctNode(1))
+    stats = patient.search(state, num_iterations=200)
+    assert stats['num_iterations_completed'] == 200
+    assert patient.num_roll_outs < 200
+    assert state.transposition_key() == GameState.root(3).transposition_key()
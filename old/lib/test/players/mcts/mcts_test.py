@@ -1,9 +1,14 @@
 from games_puzzles_algorithms.players.mcts.mcts_agent import MctsAgent
 from games_puzzles_algorithms.players.mcts.mcts_agent import UctNode
 from games_puzzles_algorithms.players.mcts.mcts_agent import BanditNode
+from games_puzzles_algorithms.players.mcts.mcts_agent import TimeIsUp
+import games_puzzles_algorithms.players.mcts.mcts_agent as mcts_agent
 from games_puzzles_algorithms.games.fake_game_state import FakeGameState
 from games_puzzles_algorithms.debug import log
+import pytest
 import random
+import sys
+import time
 
 
 def test_roll_out():
@@ -25,6 +30,7 @@ def test_roll_out():
     assert outcome['score'] == 3
     outcome = patient.roll_out(state, 1)
     assert outcome['score'] == -2
+    assert state._actions == []
 
 
 def test_search_explore3():
@@ -66,6 +72,126 @@ def test_search_explore1():
     assert stats['num_nodes_expanded'] == 9
 
 
+def test_select_node_undoes_actions_when_time_is_up():
+    random.seed(0)
+
+    state = FakeGameState()
+    patient = MctsAgent(random, UctNode(1))
+    patient.search(state, num_iterations=10)
+    assert state._actions == []
+
+    time_checks = iter([True])
+    with pytest.raises(TimeIsUp):
+        patient.select_node(patient._root,
+                            state,
+                            time_is_available=lambda: next(time_checks, False))
+    assert state._actions == []
+
+
+def test_search_reads_clock_every_time_check_interval(monkeypatch):
+    random.seed(0)
+
+    class Patient(MctsAgent):
+        time_check_interval = 4
+
+        def select_node(self, node, game_state, time_is_available):
+            def counted_time_is_available():
+                time_checks.append(True)
+                return time_is_available()
+            return super(Patient, self).select_node(
+                node,
+                game_state,
+                time_is_available=counted_time_is_available)
+
+    time_checks = []
+    clock_reads = []
+
+    def perf_counter_ns():
+        clock_reads.append(True)
+        return 0
+    monkeypatch.setattr(time, 'perf_counter_ns', perf_counter_ns)
+
+    state = FakeGameState()
+    patient = Patient(random, UctNode(1))
+    stats = patient.search(state, time_allowed_s=1, num_iterations=10)
+    assert stats['num_iterations_completed'] == 10
+    assert len(time_checks) > Patient.time_check_interval
+    # The clock is read on the first of every four checks, as well as once
+    # each to start and stop the search.
+    assert len(clock_reads) == 2 + (len(time_checks) + 3) // 4
+
+
+def test_search_without_time_allowed():
+    random.seed(0)
+
+    state = FakeGameState()
+    patient = MctsAgent(random, UctNode(1))
+    stats = patient.search(state, time_allowed_s=0)
+    assert stats['num_iterations_completed'] == 0
+    assert patient._root.num_visits == 0
+    assert state._actions == []
+
+
+def test_select_action_with_multiple_workers():
+    random.seed(0)
+
+    state = FakeGameState()
+    patient = MctsAgent(random, UctNode(1), num_workers=2)
+    action = patient.select_action(state, num_iterations=20)
+    assert action in [0, 1]
+    assert state._actions == []
+
+
+def test_search_with_multiple_roll_outs_per_leaf():
+    random.seed(0)
+
+    state = FakeGameState()
+    patient = MctsAgent(random, UctNode(1), num_roll_outs_per_leaf=3)
+    stats = patient.search(state, num_iterations=10)
+
+    assert stats['num_iterations_completed'] == 10
+    assert patient._root.num_visits == 30
+    assert state._actions == []
+
+
+def test_update_root():
+    random.seed(0)
+
+    state = FakeGameState()
+    patient = MctsAgent(random, UctNode(1))
+    action = patient.select_action(state, num_iterations=10)
+    child = [n for n in patient.to_dict()['children']
+             if n['action'] == action][0]
+
+    state.play(action)
+    patient.update_root(action)
+    assert patient._root.is_root()
+    assert patient._root.action == action
+    assert patient._root.num_visits == child['num_visits']
+
+    patient.select_action(state, num_iterations=10)
+    assert patient._root.action == action
+    assert patient._root.num_visits == child['num_visits'] + 10
+
+    patient.update_root(2)
+    assert patient._root.action is None
+    assert patient.num_nodes_in_tree() == 1
+
+
+def test_select_action_without_search_discards_updated_root():
+    random.seed(0)
+
+    state = FakeGameState()
+    patient = MctsAgent(random, UctNode(1))
+    action = patient.select_action(state, num_iterations=10)
+    state.play(action)
+    patient.update_root(action)
+
+    patient.select_action(state, time_allowed_s=0)
+    assert patient._root.action is None
+    assert patient._root.num_visits == 0
+
+
 def test_child_nodes():
     root = BanditNode()
     assert root.child_nodes() == []
@@ -117,6 +243,16 @@ def test_num_nodes():
     for child in root.child_nodes():
         assert child.num_nodes() == 1
 
+    children = root.child_nodes()
+    state.play(children[0].action)
+    children[0].expand(state)
+    assert root.num_nodes() == 5
+    assert children[0].num_nodes() == 3
+    assert children[1].num_nodes() == 1
+
+    root.reset()
+    assert root.num_nodes() == 1
+
 
 def test_ucb_initial_explore():
     root = BanditNode()
@@ -125,6 +261,7 @@ def test_ucb_initial_explore():
     children = root.child_nodes()
     for child in children:
         assert BanditNode.ucb_value(child, 1) == float('inf')
+        assert BanditNode.ucb_value(child, 0) == float('inf')
 
 
 def test_backup():
@@ -150,6 +287,35 @@ def test_backup():
     assert children[1].avg_reward() == 0
 
 
+def test_backup_multiple_visits():
+    root = BanditNode()
+    state = FakeGameState()
+    root.expand(state)
+    children = root.child_nodes()
+
+    state.play(children[0].action)
+    children[0].expand(state)
+
+    children[0].child_nodes()[0].backup(-1)
+    children[0].child_nodes()[0].backup(3, num_visits=3)
+    assert children[0].child_nodes()[0].num_visits == 4
+    assert children[0].child_nodes()[0].avg_reward() == 0.5
+    assert children[0].num_visits == 4
+    assert children[0].avg_reward() == -0.5
+    assert root.num_visits == 4
+
+
+def test_backup_deep_path():
+    root = BanditNode()
+    node = root
+    for _ in range(5 * sys.getrecursionlimit()):
+        node = BanditNode(parent=node, acting_player=0)
+    node.backup(1)
+    assert node.avg_reward() == 1
+    assert root.num_visits == 1
+    assert root.avg_reward() == 1
+
+
 def test_backup_with_lcb():
     root = BanditNode()
     state = FakeGameState()
@@ -186,6 +352,40 @@ def test_backup_with_ucb():
         2.177410022515475)
 
 
+def test_ucb_values():
+    root = BanditNode()
+    state = FakeGameState()
+    root.expand(state)
+    children = root.child_nodes()
+
+    state.play(children[0].action)
+    children[0].expand(state)
+
+    children[0].child_nodes()[0].backup(-1)
+    for exploration in [0, 1, 2]:
+        assert BanditNode.ucb_values(children, exploration) == pytest.approx(
+            [BanditNode.ucb_value(child, exploration) for child in children])
+        grandchildren = children[0].child_nodes()
+        assert (BanditNode.ucb_values(grandchildren, exploration)
+                == pytest.approx([BanditNode.ucb_value(child, exploration)
+                                  for child in grandchildren]))
+
+
+def test_ucb_values_beyond_exploration_tables():
+    root = BanditNode()
+    state = FakeGameState()
+    root.expand(state)
+    children = root.child_nodes()
+
+    children[0].backup(1, num_visits=mcts_agent._MAX_EXPLORATION_TABLE_SIZE)
+    children[1].backup(-1, num_visits=3)
+    assert (BanditNode.ucb_values(children, 1)
+            == pytest.approx([BanditNode.ucb_value(child, 1)
+                              for child in children]))
+    assert (len(mcts_agent._INV_SQRT)
+            <= mcts_agent._MAX_EXPLORATION_TABLE_SIZE)
+
+
 def test_backup_with_value():
     root = BanditNode()
     state = FakeGameState()
@@ -1,5 +1,6 @@
 from games_puzzles_algorithms.players.mcts.rave_agent \
     import RaveAgent, RaveNode, INF
+from games_puzzles_algorithms.players.mcts.mcts_agent import MctsAgent
 from games_puzzles_algorithms.players.mcts.mcts_agent import UctNode
 from games_puzzles_algorithms.games.fake_game_state import FakeGameState
 import pytest
@@ -90,3 +91,48 @@ def test_search():
     assert stats['num_iterations_completed'] == 10
     assert stats['time_used_s'] is not None
     assert stats['num_nodes_expanded'] == 11
+
+
+def test_search_enables_rave_once():
+    random.seed(0)
+
+    state = FakeGameState()
+    patient = RaveAgent(random)
+    patient.search(state, num_iterations=10)
+    play = state.play
+    state.play(0)
+    assert 0 in state.rave_moves()[0]
+
+    patient.search(state, num_iterations=10)
+    assert state.play is play
+    assert not any(state.rave_moves().values())
+    state.undo()
+    assert state._actions == []
+
+
+def test_select_action_with_multiple_workers_after_search():
+    random.seed(0)
+
+    state = FakeGameState()
+    RaveAgent(random).select_action(state, num_iterations=5)
+    play = state.play
+
+    patient = RaveAgent(random, num_workers=2)
+    action = patient.select_action(state, num_iterations=40)
+    assert action in [0, 1]
+    assert state.play is play
+    assert state._actions == []
+
+
+def test_search_with_multiple_roll_outs_per_leaf():
+    random.seed(0)
+
+    state = FakeGameState()
+    for patient in [RaveAgent(random, num_roll_outs_per_leaf=3),
+                    MctsAgent(random,
+                              RaveNode(1, 300),
+                              num_roll_outs_per_leaf=3)]:
+        stats = patient.search(state, num_iterations=5)
+        assert stats['num_iterations_completed'] == 5
+        assert patient._root.num_visits == 15
+        assert state._actions == []
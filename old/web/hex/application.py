@@ -25,6 +25,11 @@ state = game.GameState.root(row_dimension, column_dimension)
 game_agent = agents.get('Uniform Random')
 
 
+def _update_agent(action):
+    if hasattr(game_agent, 'update_root'):
+        game_agent.update_root(action)
+
+
 @app.route('/_play_move', methods=['GET'])
 def play_move():
     global state
@@ -32,7 +37,9 @@ def play_move():
     try:
         row = request.args.get('row', None, type=int)
         column = request.args.get('column', None, type=int)
-        state.play(state.board.cell_index(row, column))
+        action = state.board.cell_index(row, column)
+        state.play(action)
+        _update_agent(action)
 
         return jsonify(error=False, board=state.board._cells.tolist(),
                        winner=state.winner())
@@ -50,6 +57,7 @@ def resize_board():
         column_dimension = request.args.get('column_dimension', None, type=int)
 
         state = game.GameState.root(row_dimension, column_dimension)
+        game_agent.reset()
 
         return jsonify(error=False, board=state.board._cells.tolist(),
                        row_dimension=row_dimension,
@@ -71,6 +79,7 @@ def undo_move():
     global state
 
     state.undo()
+    game_agent.reset()
 
     return jsonify(error=False, board=state.board._cells.tolist())
 
@@ -95,6 +104,7 @@ def ai_move():
 
     try:
         state.play(move)
+        _update_agent(move)
 
         return jsonify(error=False, board=state.board._cells.tolist(),
                        winner=state.winner())
@@ -115,6 +125,7 @@ def select_agent():
             return jsonify(error=True)
 
         game_agent = new_agent
+        game_agent.reset()
 
         return jsonify(error=False)
 